@@ -13,6 +13,8 @@
 # - TARGET_COLLECTION: Name of the collection to transfer documents to.                          #
 # - BATCH_SIZE: Number of documents to process in each batch.                                    #
 # - MAX_WORKERS: Number of threads for parallel processing.                                      #
+# - PREFETCH_BATCHES: Number of cursor batches read ahead of the writers.                        #
+# - MAX_INFLIGHT_BATCHES: Maximum batches submitted but not yet written.                         #
 ##################################################################################################
 
 ##################################################################################################
@@ -22,9 +24,17 @@
 from utils.database_connections import MongoDBConnection            # Database connection
 from utils.logs_config import logger                                # Logs and events
 from tqdm import tqdm                                               # Progress bar
-from concurrent.futures import ThreadPoolExecutor                   # Multithreading support
+from concurrent.futures import ThreadPoolExecutor, as_completed     # Multithreading support
+from concurrent.futures import wait, FIRST_COMPLETED                # Bounded in-flight batches
 from pymongo import InsertOne                                       # Bulk operation
+from bson.raw_bson import RawBSONDocument                           # Undecoded BSON passthrough
+from pymongo.read_preferences import Primary, SecondaryPreferred    # Read routing
+from pymongo.read_concern import ReadConcern                        # Read isolation
+from pymongo.write_concern import WriteConcern                      # Write acknowledgement
 from os import cpu_count                                            # Optimized MAX_WORKERS num
+from itertools import islice                                        # C-level batch slicing
+from threading import Thread                                        # Cursor prefetch thread
+from queue import Queue                                             # Cursor prefetch buffer
 
 ##################################################################################################
 #                                        CONFIGURATION                                           #
@@ -32,6 +42,7 @@ from os import cpu_count                                            # Optimized
 
 BATCH_SIZE = 500            # Number of documents per batch
 MAX_WORKERS = cpu_count()   # Number of parallel threads
+MAX_INFLIGHT_BATCHES = 2 * MAX_WORKERS  # Maximum batches submitted but not yet completed (caps memory)
 
 SOURCE_DATABASE = "SOURCE_DATABASE"         # Source database name
 SOURCE_COLLECTION = "SOURCE_COLLECTION"     # Source collection name
@@ -44,6 +55,18 @@ QUERY = {"FIELD_NAME": {"$exists": True}}
 
 MOVE_MODE = False  # If True, documents will be deleted from source after copying (MOVED). If False, they will be preserved (COPIED).
 
+# Copy-only runs read from secondaries (bounded staleness) so the primary only handles writes.
+# In MOVE_MODE the copy must be current before the source is deleted, otherwise updates made within
+# the staleness window would be lost, so the source is read from the primary.
+SOURCE_READ_PREFERENCE = Primary() if MOVE_MODE else SecondaryPreferred(max_staleness=120)
+SOURCE_READ_CONCERN = ReadConcern("local")
+
+MAJORITY_WRITE_CONCERN = WriteConcern(w="majority")     # Durable target inserts in MOVE_MODE
+UNACKNOWLEDGED_WRITE_CONCERN = WriteConcern(w=0)        # Fire-and-forget source deletes in MOVE_MODE
+
+EXISTENCE_CHECK_MAX_TIME_MS = 5000  # Server-side time limit for the per-batch target _id lookup
+PREFETCH_BATCHES = 2  # Number of cursor batches read ahead while the submission loop waits on the writers
+
 LIMIT = None  # Limit on the number of documents to transfer (None for no limit)
 
 ##################################################################################################
@@ -54,6 +77,9 @@ def chunk_cursor(cursor, batch_size):
     """
     Splits a MongoDB cursor into smaller, manageable batches for memory-efficient processing.
 
+    Batches are sliced with `itertools.islice`, which runs in C and avoids a per-document
+    append and length check in Python.
+
     Args:
         cursor: MongoDB cursor object pointing to the result set.
         batch_size (int): Number of documents to include in each batch.
@@ -62,15 +88,51 @@ def chunk_cursor(cursor, batch_size):
         list: A batch (chunk) of documents from the cursor.
     """
 
-    batch = []
-    for doc in cursor:
-        batch.append(doc)
-        if len(batch) == batch_size:
-            yield batch
-            batch = []
-    if batch:
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            break
         yield batch
 
+def prefetch(iterable, depth):
+    """
+    Reads ahead from an iterable in a background thread so that fetching the next items
+    overlaps with the processing of the current ones.
+
+    A bounded queue keeps at most `depth` items buffered, so the reader never runs further
+    ahead than that. Read-ahead only helps when the consumer blocks between items, e.g. while
+    waiting for in-flight batches to drop below `MAX_INFLIGHT_BATCHES`. Exceptions raised while
+    reading are re-raised in the consuming thread.
+
+    Args:
+        iterable: Iterable to read from (e.g. the batches produced by `chunk_cursor`).
+        depth (int): Maximum number of items buffered ahead of the consumer.
+
+    Yields:
+        The items of `iterable`, in order.
+    """
+
+    buffer = Queue(maxsize=depth)
+    end_of_stream = object()
+
+    def reader():
+        try:
+            for item in iterable:
+                buffer.put(item)
+            buffer.put(end_of_stream)
+        except Exception as e:
+            buffer.put(e)
+
+    Thread(target=reader, daemon=True).start()
+
+    while True:
+        item = buffer.get()
+        if item is end_of_stream:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
 '''
 def process_batch_upsert(batch, source_conn, target_conn):
     """
@@ -128,12 +190,75 @@ def process_batch_upsert(batch, source_conn, target_conn):
 
 '''
 
+def sorted_ids(ids):
+    """
+    Sorts `_id` values so the server can walk the `_id` index in order.
+
+    MongoDB allows `_id` values of different types in one collection, which Python cannot compare
+    (e.g. str and ObjectId). Such batches are returned unsorted: the order only helps performance.
+
+    Args:
+        ids (list): `_id` values to sort.
+
+    Returns:
+        list: The sorted values, or the original list if they cannot be compared.
+    """
+
+    try:
+        return sorted(ids)
+    except TypeError:
+        return ids
+
+def supports_transactions(client):
+    """
+    Checks whether the connected deployment supports multi-document transactions.
+
+    Transactions are only available on replica sets and sharded clusters; standalone
+    servers must use the non-transactional insert-then-delete path.
+
+    Args:
+        client (MongoClient): PyMongo client connected to the deployment.
+
+    Returns:
+        bool: True if transactions can be used, False otherwise.
+    """
+
+    return client.topology_description.topology_type_name in ("ReplicaSetWithPrimary", "Sharded")
+
+def move_documents_in_transaction(bulk_inserts, ids_to_delete, source_conn):
+    """
+    Inserts documents into the target collection and deletes them from the source collection
+    within a single transaction.
+
+    Both collections are reached through the source client, since a session is bound to the
+    client that started it. Either both operations are committed or neither is. The transaction
+    is run with `with_transaction`, which retries it on transient errors (e.g. a primary step-down
+    or a write conflict) and retries the commit when its result is unknown.
+
+    Args:
+        bulk_inserts (list[InsertOne]): Insert operations for the target collection.
+        ids_to_delete (list): `_id` values to delete from the source collection.
+        source_conn (MongoDBConnection): Connection to the source MongoDB collection.
+    """
+
+    # Plain collection handles: the transaction sets the write concern, never the unacknowledged one
+    target_collection = source_conn.client[TARGET_DATABASE][TARGET_COLLECTION]
+    source_collection = source_conn.client[SOURCE_DATABASE][SOURCE_COLLECTION]
+
+    def move(session):
+        target_collection.bulk_write(bulk_inserts, ordered=False, session=session)
+        source_collection.delete_many({"_id": {"$in": ids_to_delete}}, session=session)
+
+    with source_conn.client.start_session() as session:
+        session.with_transaction(move, write_concern=MAJORITY_WRITE_CONCERN, read_preference=Primary())
+
 def process_batch_insert_missing(batch, source_conn, target_conn):
     """
     Inserts only documents that are not already present in the target collection.
 
     Ensures no duplicates by checking if each document's `_id` already exists in the target.
-    Optionally deletes transferred documents from the source collection if MOVE_MODE is enabled.
+    Optionally deletes transferred documents from the source collection if MOVE_MODE is enabled,
+    using a transaction on replica sets and sharded clusters and a two-step path on standalone servers.
 
     Args:
         batch (list): List of documents to be processed.
@@ -142,24 +267,50 @@ def process_batch_insert_missing(batch, source_conn, target_conn):
     """
 
     try:
+        # _id values are extracted once and kept aligned with the batch for the filtering pass below
         ids_batch = [doc["_id"] for doc in batch]
 
         # Get the existing _id in the destination collection
-        existing_ids = set(
-            target_conn.collection.distinct("_id", {"_id": {"$in": ids_batch}})
-        )
-
-        # Filter only documents that are not at destination
-        new_documents = [doc for doc in batch if doc["_id"] not in existing_ids]
+        # (sorted _id values let the server walk the _id index in order instead of random point lookups)
+        # (the query is forced onto the _id index and projected to _id only, so it is fully covered)
+        cursor = target_conn.collection.find(
+            {"_id": {"$in": sorted_ids(ids_batch)}},
+            {"_id": 1}
+        ).hint("_id_").max_time_ms(EXISTENCE_CHECK_MAX_TIME_MS).batch_size(len(ids_batch))
+        existing_ids = set(doc["_id"] for doc in cursor)
+
+        # Filter only documents that are not at destination, collecting their _id in the same pass
+        new_documents = []
+        new_ids = []
+        for doc, _id in zip(batch, ids_batch):
+            if _id not in existing_ids:
+                new_documents.append(doc)
+                new_ids.append(_id)
 
         if new_documents:
             bulk_inserts = [InsertOne(doc) for doc in new_documents]
-            target_conn.collection.bulk_write(bulk_inserts, ordered=False)
+            new_ids = sorted_ids(new_ids)
+
+            if MOVE_MODE and supports_transactions(source_conn.client):
+                # (MOVE MODE) Insert and delete atomically in a single transaction
+                move_documents_in_transaction(bulk_inserts, new_ids, source_conn)
+                logger.info(f"Moved {len(new_documents)} documents from {SOURCE_COLLECTION} to {TARGET_COLLECTION}")
+                return
+
+            if MOVE_MODE:
+                # (MOVE MODE) The target insert is the durability boundary, so it waits for a majority
+                target_conn.collection.with_options(write_concern=MAJORITY_WRITE_CONCERN).bulk_write(bulk_inserts, ordered=False)
+            else:
+                target_conn.collection.bulk_write(bulk_inserts, ordered=False)
             logger.info(f"Inserted {len(new_documents)} new documents into {TARGET_COLLECTION}")
 
             if MOVE_MODE:
-                # (MOVE MODE) Delete documents from source collection only if they were inserted at destination
-                source_conn.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in new_documents]}})
+                # (MOVE MODE) Delete documents from source collection only if they were inserted at destination.
+                # Fire-and-forget: the delete may be lost on a primary crash, leaving a leftover copy in the
+                # source, but the documents are already durable at the target.
+                source_conn.collection.with_options(write_concern=UNACKNOWLEDGED_WRITE_CONCERN).delete_many(
+                    {"_id": {"$in": new_ids}}
+                )
                 logger.info(f"Moved {len(new_documents)} documents from {SOURCE_COLLECTION} to {TARGET_COLLECTION}")
             else:
                 # (COPY MODE) Delete documents from source collection
@@ -177,9 +328,12 @@ def process_batch_insert_missing(batch, source_conn, target_conn):
 ##################################################################################################
 
 try:
-    # Connect to MongoDB source collection
-    with MongoDBConnection(database_name=SOURCE_DATABASE, collection_name=SOURCE_COLLECTION) as source_conn:
-        cursor = source_conn.collection.find(QUERY)
+    # Connect to MongoDB source collection (documents are kept as raw BSON and forwarded as-is)
+    with MongoDBConnection(database_name=SOURCE_DATABASE, collection_name=SOURCE_COLLECTION,
+                           document_class=RawBSONDocument, read_preference=SOURCE_READ_PREFERENCE,
+                           read_concern=SOURCE_READ_CONCERN, max_workers=MAX_WORKERS) as source_conn:
+        # Align the server-side getMore size with the client-side batch size
+        cursor = source_conn.collection.find(QUERY).batch_size(BATCH_SIZE)
 
         # Apply limit if specified
         if LIMIT is not None:
@@ -191,28 +345,41 @@ try:
         # Create progress bar
         with tqdm(total=total_docs, desc="Processing documents") as pbar:
             # Connect to MongoDB target collection
-            with MongoDBConnection(database_name=TARGET_DATABASE, collection_name=TARGET_COLLECTION) as target_conn:
+            with MongoDBConnection(database_name=TARGET_DATABASE, collection_name=TARGET_COLLECTION,
+                                   max_workers=MAX_WORKERS) as target_conn:
                 with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                    futures = []
-                    batch_sizes = []
+                    inflight = {}    # Pending futures mapped to their batch size
                     batch_count = 0  # Processed batch counter
 
-                    for batch in chunk_cursor(cursor, BATCH_SIZE):
+                    # The next cursor batches are fetched while the submission loop waits on the writers
+                    for batch in prefetch(chunk_cursor(cursor, BATCH_SIZE), PREFETCH_BATCHES):
                         batch_count += 1
                         logger.info(f"Processing batch {batch_count} with {len(batch)} documents.")
 
+                        # Back-pressure: wait for a batch to finish before taking more from the cursor
+                        if len(inflight) >= MAX_INFLIGHT_BATCHES:
+                            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                batch_len = inflight.pop(future)
+                                try:
+                                    future.result()         # Ensures that there are no exceptions in the threads
+                                    pbar.update(batch_len)  # Update progress bar
+                                except Exception as e:
+                                    logger.error(f"Error in thread: {e}")
+
                         future = executor.submit(
                             process_batch_insert_missing,
                             batch,
                             source_conn,
                             target_conn
                         )
-                        futures.append((future, len(batch)))
+                        inflight[future] = len(batch)
 
-                    for future, batch_len in futures:
+                    # Drain the remaining batches in completion order so progress is reported as they finish
+                    for future in as_completed(inflight):
                         try:
-                            future.result()         # Ensures that there are no exceptions in the threads
-                            pbar.update(batch_len)  # Update progress bar
+                            future.result()                 # Ensures that there are no exceptions in the threads
+                            pbar.update(inflight[future])   # Update progress bar
                         except Exception as e:
                             logger.error(f"Error in thread: {e}")
 
@@ -23,6 +23,10 @@ from utils.logs_config import logger                                # Logs and e
 from tqdm import tqdm                                               # Progress bar
 from concurrent.futures import ThreadPoolExecutor, as_completed     # Multithreading support
 from bson.objectid import ObjectId                                  # MongoDB ObjectId
+from bson.raw_bson import RawBSONDocument                           # Undecoded BSON passthrough
+from pymongo.read_preferences import Primary, SecondaryPreferred    # Read routing
+from pymongo.read_concern import ReadConcern                        # Read isolation
+from pymongo.write_concern import WriteConcern                      # Write acknowledgement
 from os import cpu_count                                            # Optimized MAX_WORKERS num
 
 ##################################################################################################
@@ -40,6 +44,15 @@ TARGET_COLLECTION = "TARGET_COLLECTION"     # Target collection name
 
 MOVE_MODE = False  # If True, documents will be deleted from source after copying (MOVED). If False, they will be preserved (COPIED).
 
+# Copy-only runs read from secondaries (bounded staleness) so the primary only handles writes.
+# In MOVE_MODE the copy must be current before the source is deleted, otherwise updates made within
+# the staleness window would be lost, so the source is read from the primary.
+SOURCE_READ_PREFERENCE = Primary() if MOVE_MODE else SecondaryPreferred(max_staleness=120)
+SOURCE_READ_CONCERN = ReadConcern("local")
+
+MAJORITY_WRITE_CONCERN = WriteConcern(w="majority")     # Durable target inserts in MOVE_MODE
+UNACKNOWLEDGED_WRITE_CONCERN = WriteConcern(w=0)        # Fire-and-forget source deletes in MOVE_MODE
+
 TXT_FILE_PATH = "inputs/ids.txt"  # Path to the text file with _id (Mongo Primary Key) list
 
 ##################################################################################################
@@ -88,14 +101,19 @@ def move_documents_in_parallel(batch, source_conn, target_conn):
         try:
             document = source_conn.collection.find_one({"_id": _id})
             if document:
-                # Insert into the target collection
-                target_conn.collection.insert_one(document)
-
                 if MOVE_MODE:
-                    # (MOVE MODE) Delete documents from source collection only if they were inserted at destination
-                    source_conn.collection.delete_one({"_id": _id})
+                    # (MOVE MODE) The target insert is the durability boundary, so it waits for a majority
+                    target_conn.collection.with_options(write_concern=MAJORITY_WRITE_CONCERN).insert_one(document)
+
+                    # (MOVE MODE) Delete documents from source collection only if they were inserted at destination.
+                    # Fire-and-forget: the delete may be lost on a primary crash, leaving a leftover copy in the
+                    # source, but the document is already durable at the target.
+                    source_conn.collection.with_options(write_concern=UNACKNOWLEDGED_WRITE_CONCERN).delete_one({"_id": _id})
                     logger.info(f"Moved document {_id} from {SOURCE_COLLECTION} to {TARGET_COLLECTION}")
                 else:
+                    # Insert into the target collection
+                    target_conn.collection.insert_one(document)
+
                     # (COPY MODE) Delete documents from source collection
                     logger.info(f"Copied document {_id} from {SOURCE_COLLECTION} to {TARGET_COLLECTION}")
 
@@ -118,9 +136,12 @@ try:
     # Create batches of IDs
     batches = [ids_to_process[i:i + BATCH_SIZE] for i in range(0, total_docs, BATCH_SIZE)]
 
-    # Connect to source and target collections
-    with MongoDBConnection(database_name=SOURCE_DATABASE, collection_name=SOURCE_COLLECTION) as source_conn, \
-         MongoDBConnection(database_name=TARGET_DATABASE, collection_name=TARGET_COLLECTION) as target_conn:
+    # Connect to source and target collections (source documents are kept as raw BSON and forwarded as-is)
+    with MongoDBConnection(database_name=SOURCE_DATABASE, collection_name=SOURCE_COLLECTION,
+                           document_class=RawBSONDocument, read_preference=SOURCE_READ_PREFERENCE,
+                           read_concern=SOURCE_READ_CONCERN, max_workers=MAX_WORKERS) as source_conn, \
+         MongoDBConnection(database_name=TARGET_DATABASE, collection_name=TARGET_COLLECTION,
+                           max_workers=MAX_WORKERS) as target_conn:
 
         # Progress bar
         with tqdm(total=total_docs, desc="Moving documents") as pbar:
@@ -2,8 +2,9 @@
 #                                        SCRIPT OVERVIEW                                         #
 #                                                                                                #
 # This script connects to a MongoDB collection and updates a specified field in documents        #
-# matching a given query. Updates are performed in batches with multi-threading to optimize      #
-# performance. Logging and progress visualization are included for easy monitoring.              #
+# matching a given query. The update is a constant value, so it is applied with a single         #
+# server-side `update_many` command, letting MongoDB batch and yield internally. Logging is      #
+# included for easy monitoring.                                                                  #
 #                                                                                                #
 # Configuration is customizable via constants at the top of the script.                          #
 ##################################################################################################
@@ -12,102 +13,61 @@
 #                                            IMPORTS                                             #
 ##################################################################################################
 
-from utils.database_connections import MongoDBConnection            # Database connection
+from utils.database_connections import get_collection, ensure_index # Database connection
 from utils.logs_config import logger                                # Logs and events
-from tqdm import tqdm                                               # Progress bar
-from concurrent.futures import ThreadPoolExecutor, as_completed     # Multithreading support
-from pymongo import UpdateOne                                       # Bulk operation
-from datetime import datetime                                       # Timestamp
-from os import cpu_count                                            # Optimized MAX_WORKERS num
 
 ##################################################################################################
 #                                        CONFIGURATION                                           #
 ##################################################################################################
 
-BATCH_SIZE = 500            # Number of documents per batch
-MAX_WORKERS = cpu_count()   # Number of parallel threads
-
 DATABASE_NAME = "DATABASE_NAME"     # Source database
 COLLECTION_NAME = "COLLECTION_NAME" # Source collection
 
 # Query to find documents with the field to be modified/updated
 QUERY = {"FIELD_NAME": "FIELD_VALUE"}
+QUERY_INDEX_FIELD = None  # Field indexed before the update so QUERY avoids a collection scan (None to skip)
 
 # New value to set
 FIELD_TO_UPDATE = "FIELD_NAME"
 UPDATED_VALUE = "FIELD_VALUE_NEW"
 
-# Timestamp updated
+# Timestamp updated (set server-side to the time of the update when UPDATE_TIMESTAMP is True)
 TIMESTAMP = "timestamp"
+UPDATE_TIMESTAMP = False
 
 ##################################################################################################
 #                                        IMPLEMENTATION                                          #
 ##################################################################################################
 
-def process_batch(batch_ids, collection):
-    """
-    Processes a batch of document IDs and updates a specified field in each document.
-
-    The update includes setting a new value for the configured field. Optionally, a timestamp
-    can be added for tracking updates.
-
-    Args:
-        batch_ids (list[ObjectId]): List of document `_id` values to update.
-        collection (pymongo.collection.Collection): The MongoDB collection where updates will be applied.
-
-    Returns:
-        int: The number of documents successfully processed in the batch.
-    """
-
-    try:
-        bulk_ops = [
-            UpdateOne(
-                {"_id": _id},
-                {"$set": {
-                    FIELD_TO_UPDATE: UPDATED_VALUE,
-                    #TIMESTAMP : datetime.utcnow()
-                }}
-            ) for _id in batch_ids
-        ]
-        if bulk_ops:
-            collection.bulk_write(bulk_ops, ordered=False)
-        return len(batch_ids)
-    except Exception as e:
-        logger.error(f"❌ Error in batch: {e}")
-        return 0
-
 def update_field(collection):
     """
-    Orchestrates the update operation by retrieving documents that match the specified query
-    and updating a target field in parallel using batch processing.
+    Updates a target field in every document that matches the specified query.
 
-    Steps:
-    - Retrieves all matching document `_id`s.
-    - Splits them into batches for memory efficiency.
-    - Executes updates in parallel threads using a thread pool.
-    - Tracks progress via a progress bar.
+    The new value does not depend on the document, so the whole update is sent as a single
+    `update_many` command and executed server-side, with no client-side batching or threads.
+    Optionally, a server-side timestamp can be added for tracking updates.
 
     Args:
         collection (pymongo.collection.Collection): The MongoDB collection to process.
+
+    Returns:
+        UpdateResult | None: The result of the update operation, or None if it fails.
     """
 
     try:
-        cursor = collection.find(QUERY, projection={"_id": 1}).batch_size(BATCH_SIZE)
-        ids = [doc["_id"] for doc in cursor]
-        total_docs = len(ids)
+        # Pipeline-style update: `$literal` keeps the value from being read as an expression,
+        # and `$$NOW` lets the server stamp the time instead of sending a client-side datetime
+        update_fields = {FIELD_TO_UPDATE: {"$literal": UPDATED_VALUE}}
+        if UPDATE_TIMESTAMP:
+            update_fields[TIMESTAMP] = "$$NOW"
 
-        logger.info(f"📊 Total documents to update: {total_docs}")
-        batches = [ids[i:i + BATCH_SIZE] for i in range(0, total_docs, BATCH_SIZE)]
-
-        with tqdm(total=total_docs, desc=f"Updating '{FIELD_TO_UPDATE}' field") as pbar:
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = [executor.submit(process_batch, batch, collection) for batch in batches]
-                for future in as_completed(futures):
-                    updated_count = future.result()
-                    pbar.update(updated_count)
+        result = collection.update_many(QUERY, [{"$set": update_fields}])
+        logger.info(f"📊 Matched {result.matched_count} documents, modified {result.modified_count}.")
+        return result
 
     except Exception as e:
         logger.error(f"❌ Error during update: {e}")
+        return None
 
 ##################################################################################################
 #                                               MAIN                                             #
@@ -115,10 +75,12 @@ def update_field(collection):
 
 if __name__ == "__main__":
     try:
-        with MongoDBConnection(database_name=DATABASE_NAME, collection_name=COLLECTION_NAME) as db_conn:
-            logger.info("🔗 MongoDB connection opened.")
-            update_field(db_conn.collection)
-            logger.info("✅ Update process completed successfully.")
+        collection = get_collection(DATABASE_NAME, COLLECTION_NAME)
+        if QUERY_INDEX_FIELD is not None:
+            ensure_index(collection, QUERY_INDEX_FIELD)
+
+        update_field(collection)
+        logger.info("✅ Update process completed successfully.")
 
     except Exception as exc:
         logger.error(f"❌ Connection or execution error: {exc}")
@@ -19,24 +19,36 @@
 # - `BATCH_SIZE`: Number of documents to process in each batch.                                  #
 # - `MAX_WORKERS`: Number of threads for parallel processing.                                    #
 # - `FIELDS_TO_COPY`: List of specific fields to update in the target collection.                #
+# - `USE_MERGE_PIPELINE`: Merge batches server-side with `$documents` + `$merge` (MongoDB 5.1+). #
 ##################################################################################################
 
 ##################################################################################################
 #                                            IMPORTS                                             #
 ##################################################################################################
 
-from utils.database_connections import MongoDBConnection            # Database connection
+from utils.database_connections import get_collection, ensure_index # Database connection
 from utils.logs_config import logger                                # Logs and events
 from tqdm import tqdm                                               # Progress bar
 from concurrent.futures import ThreadPoolExecutor, as_completed     # Multithreading support
+from concurrent.futures import ProcessPoolExecutor                  # Multiprocessing support
+from multiprocessing import get_context                             # Worker process start method
+from concurrent.futures import wait, FIRST_COMPLETED                # Bounded in-flight batches
+from pymongo import UpdateOne, UpdateMany                           # Bulk operation
+from collections import defaultdict                                 # Grouping identical payloads
+from pymongo.write_concern import WriteConcern                      # Write acknowledgement
 from os import cpu_count                                            # Optimized MAX_WORKERS num
+from operator import itemgetter                                     # C-level field extraction
+import time                                                         # Session refresh interval
 
 ##################################################################################################
 #                                        CONFIGURATION                                           #
 ##################################################################################################
 
 BATCH_SIZE = 500            # Number of documents per batch
-MAX_WORKERS = cpu_count()   # Number of parallel threads
+MAX_WORKERS = cpu_count()   # Number of parallel threads (or processes, see USE_PROCESSES)
+MAX_INFLIGHT_BATCHES = 2 * MAX_WORKERS  # Maximum batches submitted but not yet completed (caps memory)
+LOG_EVERY_N_BATCHES = 100   # Batch submission progress is logged once every N batches
+SESSION_REFRESH_INTERVAL = 300  # Seconds between keep-alives of the cursor's session (expires after 30 idle minutes)
 
 SOURCE_DATABASE = "SOURCE_DATABASE"         # Source database name
 SOURCE_COLLECTION = "SOURCE_COLLECTION"     # Source collection name
@@ -46,11 +58,26 @@ TARGET_COLLECTION = "TARGET_COLLECTION"     # Target collection name
 
 # MongoDB query to select documents
 QUERY = {"FIELD_NAME": { "$exists": True }}
+QUERY_INDEX_FIELD = None  # Field indexed (sparse) before reading so QUERY avoids a collection scan (None to skip)
 
 # Specific fields to copy
 FIELDS_TO_COPY = ["FIELD_NAME_1", "FIELD_NAME_2"]
 LIMIT = None  # Limit on the number of documents to transfer (None for no limit)
 
+# If True, each batch is joined and merged server-side with a single `$documents` + `$merge`
+# aggregation (opt-in, requires MongoDB 5.1+). If False, batches are applied with an unordered bulk_write.
+USE_MERGE_PIPELINE = False
+
+# If True, bulk_write updates (USE_MERGE_PIPELINE = False) are sent unacknowledged (w=0): batches are
+# pipelined without waiting for the server, but write errors and matched counts are not reported.
+# The `$set` updates are idempotent, so a failed run can simply be repeated.
+UNACKNOWLEDGED_WRITES = False
+
+# If True, batches are processed by worker processes (each with its own MongoDB client) instead of
+# threads, so building the update operations is not serialized by the GIL. Batches are pickled to
+# the workers, so this only pays off when client-side CPU, not the network, is the bottleneck.
+USE_PROCESSES = False
+
 ##################################################################################################
 #                                        IMPLEMENTATION                                          #
 ##################################################################################################
@@ -76,12 +103,17 @@ def chunk_cursor(cursor, batch_size):
     if batch:
         yield batch
 
+# Precompiled getter for FIELDS_TO_COPY (returns a tuple of values, or a single value for one field)
+fields_getter = itemgetter(*FIELDS_TO_COPY)
+
 def filter_document_fields(doc):
     """
     Extracts only the specified fields from a document.
 
     This function filters a MongoDB document and returns a new dictionary containing
-    only the keys defined in `FIELDS_TO_COPY`.
+    only the keys defined in `FIELDS_TO_COPY`. The common case, where every field is
+    present, is served by a precompiled `itemgetter`; documents missing some fields
+    fall back to a per-key check.
 
     Args:
         doc (dict): The original MongoDB document.
@@ -90,89 +122,249 @@ def filter_document_fields(doc):
         dict: A filtered dictionary containing only relevant fields.
     """
 
-    return {key: doc[key] for key in FIELDS_TO_COPY if key in doc}
+    try:
+        values = fields_getter(doc)
+    except KeyError:
+        return {key: doc[key] for key in FIELDS_TO_COPY if key in doc}
+
+    if len(FIELDS_TO_COPY) == 1:
+        return {FIELDS_TO_COPY[0]: values}
+    return dict(zip(FIELDS_TO_COPY, values))
 
-def process_batch_update_matching(batch, source_conn, target_conn):
+def process_batch_update_matching(batch, target_collection):
     """
     Updates existing documents in the target collection by matching `_id` values.
 
     For each document in the batch that already exists in the target collection,
     this function updates only the fields defined in `FIELDS_TO_COPY`, preserving
-    all other existing inputs.
+    all other existing inputs. Documents not present in the target are left untouched
+    (no upsert), and the number of matched documents is read from the bulk write result.
+    Documents that share the same field values are grouped into a single `UpdateMany`.
 
     Args:
         batch (list[dict]): List of source documents to use for updates.
-        source_conn (MongoDBConnection): Connection to the source MongoDB collection.
-        target_conn (MongoDBConnection): Connection to the target MongoDB collection.
+        target_collection (Collection): The target MongoDB collection.
     """
 
     try:
-        # Get the existing _id in the destination collection
-        cursor = target_conn.collection.find(
-            {"_id": {"$in": [doc["_id"] for doc in batch]}},
-            {"_id": 1}
-        )
-        existing_ids = set(doc["_id"] for doc in cursor)
-
-        # Filter only documents whose _id already exists in the target collection
-        matching_documents = [doc for doc in batch if doc["_id"] in existing_ids]
-
-        if matching_documents:
-            for doc in matching_documents:
-                update_fields = filter_document_fields(doc)
-                target_conn.collection.update_one({"_id": doc["_id"]}, {"$set": update_fields})
-            logger.info(f"Updated {len(matching_documents)} documents in {TARGET_COLLECTION}")
+        # Updates without upsert are no-ops for _id values missing from the target collection,
+        # so no existence check is needed; documents without any field to copy are skipped
+        bulk_ops = []
+        grouped_ids = defaultdict(list)     # Payload key -> _id values sharing that payload
+        payloads = {}                       # Payload key -> fields to set
+        for doc in batch:
+            update_fields = filter_document_fields(doc)
+            if not update_fields:
+                continue
+
+            # The value type is part of the key so that e.g. True and 1 are not grouped together
+            key = tuple((field, type(value), value) for field, value in update_fields.items())
+            try:
+                grouped_ids[key].append(doc["_id"])
+            except TypeError:
+                # Unhashable values (arrays, embedded documents) are updated individually
+                bulk_ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update_fields}))
+                continue
+            payloads.setdefault(key, update_fields)
+
+        # Documents sharing the same payload are updated together with a single UpdateMany
+        for key, ids in grouped_ids.items():
+            if len(ids) == 1:
+                bulk_ops.append(UpdateOne({"_id": ids[0]}, {"$set": payloads[key]}))
+            else:
+                bulk_ops.append(UpdateMany({"_id": {"$in": ids}}, {"$set": payloads[key]}))
+
+        if bulk_ops:
+            if UNACKNOWLEDGED_WRITES:
+                target_collection.with_options(write_concern=WriteConcern(w=0)).bulk_write(bulk_ops, ordered=False)
+                logger.debug(f"Sent {len(bulk_ops)} unacknowledged updates to {TARGET_COLLECTION}")
+            else:
+                result = target_collection.bulk_write(bulk_ops, ordered=False)
+                logger.debug(f"Updated {result.matched_count} documents in {TARGET_COLLECTION}")
     except Exception as e:
         logger.error(f"Failed to process batch: {e}")
 
+def process_batch_merge_matching(batch, target_collection):
+    """
+    Updates existing documents in the target collection through a server-side merge.
+
+    The batch is sent as a `$documents` stage and merged into the target collection by `_id`:
+    matching documents get the fields defined in `FIELDS_TO_COPY` merged in, and documents not
+    present in the target are discarded. The join and the writes run entirely on the server,
+    in a single round trip per batch.
+
+    Args:
+        batch (list[dict]): List of source documents to use for updates.
+        target_collection (Collection): The target MongoDB collection.
+    """
+
+    try:
+        documents = []
+        for doc in batch:
+            update_fields = filter_document_fields(doc)
+            if update_fields:
+                documents.append({"_id": doc["_id"], **update_fields})
+
+        if documents:
+            target_collection.database.aggregate([
+                # `$documents` evaluates an expression: `$literal` keeps values such as "$100", or
+                # embedded documents with `$`-prefixed keys, from being read as paths or operators
+                {"$documents": {"$literal": documents}},
+                {"$merge": {
+                    "into": {"db": TARGET_DATABASE, "coll": TARGET_COLLECTION},
+                    "on": "_id",
+                    "whenMatched": "merge",
+                    "whenNotMatched": "discard"
+                }}
+            ])
+            logger.debug(f"Merged {len(documents)} documents into {TARGET_COLLECTION}")
+    except Exception as e:
+        logger.error(f"Failed to process batch: {e}")
+
+def process_batch(batch, target_collection):
+    """
+    Processes a batch with the configured update strategy (see `USE_MERGE_PIPELINE`).
+
+    Args:
+        batch (list[dict]): List of source documents to use for updates.
+        target_collection (Collection): The target MongoDB collection.
+    """
+
+    if USE_MERGE_PIPELINE:
+        process_batch_merge_matching(batch, target_collection)
+    else:
+        process_batch_update_matching(batch, target_collection)
+
+def init_worker_process():
+    """
+    Opens the target collection in a worker process.
+
+    MongoDB clients cannot be shared across processes, so each worker process opens its own
+    client once and reuses it for every batch it handles.
+    """
+
+    global worker_target_collection
+    worker_target_collection = get_collection(TARGET_DATABASE, TARGET_COLLECTION)
+
+def process_batch_in_worker(batch):
+    """
+    Processes a batch in a worker process using that process's own target collection.
+
+    Args:
+        batch (list[dict]): List of source documents to use for updates.
+    """
+
+    process_batch(batch, worker_target_collection)
+
 ##################################################################################################
 #                                               MAIN                                             #
 ##################################################################################################
 
-try:
-    # Connect to MongoDB source collection
-    with MongoDBConnection(database_name=SOURCE_DATABASE, collection_name=SOURCE_COLLECTION) as source_conn:
-        cursor = source_conn.collection.find(QUERY)
+if __name__ == "__main__":
+    try:
+        # Cached collection handles (reused if this module is run again in the same process),
+        # sharing one client whose connection pool is sized for MAX_WORKERS threads
+        source_collection = get_collection(SOURCE_DATABASE, SOURCE_COLLECTION, MAX_WORKERS)
+        target_collection = get_collection(TARGET_DATABASE, TARGET_COLLECTION, MAX_WORKERS)
+
+        # A sparse index only holds documents that have the field, matching the `$exists` query
+        if QUERY_INDEX_FIELD is not None:
+            ensure_index(source_collection, QUERY_INDEX_FIELD, sparse=True)
+
+        # Only `_id` and the copied fields are returned by the server
+        projection = {"_id": 1, **{field: 1 for field in FIELDS_TO_COPY}}
+
+        # Bound each getMore to one batch instead of the driver's 16 MiB default. The cursor is never
+        # timed out by the server (long runs can exceed the 10-minute idle limit when workers back up),
+        # so it is explicitly closed once processing ends. It still dies with its session after 30 idle
+        # minutes, so it runs in an explicit session that is kept alive with `refreshSessions`.
+        client = source_collection.database.client
+        session = client.start_session()
+        cursor = source_collection.find(
+            QUERY, projection, no_cursor_timeout=True, session=session
+        ).batch_size(BATCH_SIZE)
+        last_refresh = time.monotonic()
 
         # Apply limit if specified
         if LIMIT is not None:
             cursor = cursor.limit(LIMIT)
 
-        total_docs = source_conn.collection.count_documents(QUERY)
-        logger.info(f"Total documents found: {total_docs}")
-
-        # Create progress bar
-        with tqdm(total=total_docs, desc="Processing documents") as pbar:
-            # Connect to MongoDB target collection
-            with MongoDBConnection(database_name=TARGET_DATABASE, collection_name=TARGET_COLLECTION) as target_conn:
-                with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                    futures = []
+        # An exact count would scan as much as the main query itself, so the total is only estimated
+        # from collection metadata when the query matches every document. Otherwise the progress bar
+        # shows throughput only (or is bounded by LIMIT when set).
+        total_docs = None if QUERY else source_collection.estimated_document_count()
+        if LIMIT is not None:
+            total_docs = LIMIT if total_docs is None else min(total_docs, LIMIT)
+
+        if total_docs is not None:
+            logger.info(f"Estimated documents to process: {total_docs}")
+        else:
+            logger.info("Total documents not counted; progress will show throughput only.")
+
+        if USE_PROCESSES:
+            # Workers are spawned rather than forked so they never inherit this process's client
+            executor = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS,
+                mp_context=get_context("spawn"),
+                initializer=init_worker_process
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+        try:
+            # Create progress bar
+            with tqdm(total=total_docs, desc="Processing documents") as pbar:
+                with executor:
+                    inflight = {}   # Pending futures mapped to their batch size
                     batch_count = 0 # Processed batch counter
 
                     for batch in chunk_cursor(cursor, BATCH_SIZE):
                         batch_count += 1
-                        logger.info(f"Processing batch {batch_count} with {len(batch)} documents.")
-
-                        futures.append(
-                            executor.submit(
-                                process_batch_update_matching,
-                                batch,
-                                source_conn,
-                                target_conn
-                            )
-                        )
-
-                    for future, batch_len in futures:
+                        if batch_count % LOG_EVERY_N_BATCHES == 0:
+                            logger.info(f"Processing batch {batch_count} with {len(batch)} documents.")
+
+                        # Back-pressure: wait for a batch to finish before reading more from the cursor
+                        if len(inflight) >= MAX_INFLIGHT_BATCHES:
+                            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                batch_len = inflight.pop(future)
+                                try:
+                                    future.result()         # Ensures that there are no exceptions in the threads
+                                    pbar.update(batch_len)  # Update progress bar
+                                except Exception as e:
+                                    logger.error(f"Error in thread: {e}")
+
+                        # Keep the cursor's session alive while workers are backed up
+                        if time.monotonic() - last_refresh >= SESSION_REFRESH_INTERVAL:
+                            try:
+                                client.admin.command("refreshSessions", [session.session_id])
+                            except Exception as e:
+                                logger.warning(f"Could not refresh the cursor session: {e}")
+                            last_refresh = time.monotonic()
+
+                        if USE_PROCESSES:
+                            future = executor.submit(process_batch_in_worker, batch)
+                        else:
+                            future = executor.submit(process_batch, batch, target_collection)
+                        inflight[future] = len(batch)
+
+                    # Drain the remaining batches in completion order so progress is reported as they finish
+                    for future in as_completed(inflight):
                         try:
-                            future.result()         # Ensures that there are no exceptions in the threads
-                            pbar.update(batch_len)  # Update progress bar
+                            future.result()                 # Ensures that there are no exceptions in the threads
+                            pbar.update(inflight[future])   # Update progress bar
                         except Exception as e:
                             logger.error(f"Error in thread: {e}")
 
-    logger.info(f"✅ Data successfully updated in {TARGET_COLLECTION} from {SOURCE_COLLECTION}.")
+        finally:
+            # Release the server-side cursor (it is not reaped automatically)
+            cursor.close()
+            session.end_session()
 
-except Exception as e:
-    logger.error(f"❌ Error during processing: {e}")
+        logger.info(f"✅ Data successfully updated in {TARGET_COLLECTION} from {SOURCE_COLLECTION}.")
+
+    except Exception as e:
+        logger.error(f"❌ Error during processing: {e}")
 
-finally:
-    logger.info("✅ Process completed and connection closed.")
+    finally:
+        logger.info("✅ Process completed.")
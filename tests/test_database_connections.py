@@ -0,0 +1,145 @@
+##################################################################################################
+#                                      DATABASE CONNECTION TESTS                                 #
+#                                                                                                #
+# Checks MongoDBConnection helpers against an in-memory stand-in for a collection, so no MongoDB #
+# server is needed. Run from the repository root with `python -m pytest`.                        #
+##################################################################################################
+
+import gc
+import uuid
+
+import bson
+import pytest
+import utils.database_connections as database_connections
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from pymongo import MongoClient, UpdateMany
+from pymongo.errors import AutoReconnect
+
+from utils.database_connections import MongoDBConnection, close_clients
+
+##################################################################################################
+#                                        IMPLEMENTATION                                          #
+##################################################################################################
+
+class FakeCollection:
+    """
+    Applies `$set` bulk operations, in order, to in-memory documents keyed by `_id`.
+    """
+
+    codec_options = DEFAULT_CODEC_OPTIONS
+
+    def __init__(self):
+        self.documents = {}
+        self.operations = []
+        self.ordered = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.ordered.append(ordered)
+        for operation in operations:
+            self.operations.append(operation)
+            document = operation._doc
+            update = bson.decode(document.raw) if hasattr(document, "raw") else document
+            _id = operation._filter["_id"]
+            ids = _id["$in"] if isinstance(_id, dict) else [_id]
+            for doc_id in ids:
+                self.documents.setdefault(doc_id, {}).update(update["$set"])
+
+        class Result:
+            matched_count = len(operations)
+
+        return Result()
+
+class FailingCursor:
+    """
+    Cursor that yields `count` documents and then raises a network error.
+    """
+
+    def __init__(self, count):
+        self.count = count
+
+    def batch_size(self, batch_size):
+        return self
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield {"_id": i}
+        raise AutoReconnect("connection lost")
+
+def make_connection():
+    connection = MongoDBConnection.__new__(MongoDBConnection)
+    connection.collection = FakeCollection()
+    return connection
+
+def test_bulk_update_keeps_last_write_for_repeated_id():
+    connection = make_connection()
+
+    connection.bulk_update([({"_id": 1}, {"s": "a"}), ({"_id": 2}, {"s": "b"}), ({"_id": 2}, {"s": "a"})])
+
+    assert connection.collection.documents == {1: {"s": "a"}, 2: {"s": "a"}}
+    assert connection.collection.ordered == [True]
+
+def test_bulk_update_groups_identical_payloads():
+    connection = make_connection()
+
+    connection.bulk_update([({"_id": 1}, {"s": "a"}), ({"_id": 2}, {"s": "a"}), ({"_id": 3}, {"s": "b"})])
+
+    assert connection.collection.documents == {1: {"s": "a"}, 2: {"s": "a"}, 3: {"s": "b"}}
+    assert isinstance(connection.collection.operations[0], UpdateMany)
+    assert len(connection.collection.operations) == 2
+    assert connection.collection.ordered == [False]
+
+def test_bulk_update_sends_unencodable_payloads_as_plain_updates():
+    connection = make_connection()
+    value = uuid.uuid4()  # Not encodable without an explicit UUID representation
+
+    connection.bulk_update([({"_id": 1}, {"u": value}), ({"_id": 2}, {"s": "a"})])
+
+    assert connection.collection.documents == {1: {"u": value}, 2: {"s": "a"}}
+
+def test_find_documents_raises_when_interrupted_mid_stream():
+    connection = make_connection()
+    connection.collection.find = lambda filter_query, projection: FailingCursor(3)
+
+    with pytest.raises(AutoReconnect):
+        list(connection.find_documents({}, ["_id"]))
+    with pytest.raises(AutoReconnect):
+        list(connection.find_documents_batched({}, ["_id"], batch_size=2))
+
+def test_queued_updates_are_discarded_when_handle_is_dropped(monkeypatch):
+    applied = []
+    monkeypatch.setattr(MongoDBConnection, "bulk_update", lambda self, updates, **kwargs: applied.extend(updates))
+    client = MongoClient(connect=False)
+
+    connection = MongoDBConnection("db", "coll", client=client)
+    connection.update_document({"_id": 1}, {"s": "a"})
+    del connection
+    gc.collect()
+
+    assert applied == []
+    client.close()
+
+def test_close_clients_flushes_live_handles(monkeypatch):
+    applied = []
+    monkeypatch.setattr(MongoDBConnection, "bulk_update", lambda self, updates, **kwargs: applied.extend(updates))
+    client = MongoClient(connect=False)
+
+    connection = MongoDBConnection("db", "coll", client=client)
+    connection.update_document({"_id": 1}, {"s": "a"})
+    close_clients()
+
+    assert applied == [({"_id": 1}, {"s": "a"})]
+    client.close()
+
+def test_find_one_batched_resolves_remaining_lookups_after_a_cancel(monkeypatch):
+    monkeypatch.setattr(database_connections, "LOOKUP_WINDOW", 0.2)
+    client = MongoClient(connect=False)
+    connection = MongoDBConnection("db", "coll", client=client)
+    connection.collection = FakeCollection()
+    connection.collection.find = lambda filter_query: [{"_id": _id} for _id in filter_query["_id"]["$in"]]
+
+    cancelled = connection.find_one_batched(1)
+    remaining = connection.find_one_batched(2)
+    assert cancelled.cancel()
+
+    assert remaining.result(timeout=5) == {"_id": 2}
+    client.close()
@@ -3,7 +3,8 @@
 #                                                                                                #
 # This module handles the MongoDB database connection setup and provides helper methods          #
 # for common operations such as finding and updating documents. It uses a context manager        #
-# pattern to ensure proper opening and closing of connections.                                   #
+# pattern to ensure proper opening and closing of connections, with an asyncio counterpart       #
+# for scripts that drive concurrent operations from a single event loop.                         #
 # Configuration parameters are loaded securely from environment variables using dotenv.          #
 ##################################################################################################
 
@@ -13,9 +14,26 @@
 
 import os
 import time
+import asyncio
+import random
+import importlib.util
+import threading
+import atexit
+import weakref
+from concurrent.futures import Future
+from functools import lru_cache
+from itertools import islice
+from collections import defaultdict
 
 from dotenv import load_dotenv
+import bson                             # Pre-encoded update payloads
+from bson.errors import BSONError        # Unencodable update payloads
+from bson.raw_bson import RawBSONDocument # Lazily decoded documents
 from pymongo import MongoClient         # MongoDB
+from pymongo import AsyncMongoClient    # MongoDB (asyncio)
+from pymongo import UpdateOne, UpdateMany # Bulk operation
+from pymongo.errors import BulkWriteError, ConnectionFailure # Retry handling
+from pymongo.errors import OperationFailure, PyMongoError, ServerSelectionTimeoutError # Query error handling
 import urllib.parse                     # MongoDB
 from utils.logs_config import logger    # Logs and events
 
@@ -23,7 +41,14 @@ from utils.logs_config import logger    # Logs and events
 #                                        CONFIGURATION                                           #
 ##################################################################################################
 
-load_dotenv()  # Load environment variables from .env
+MONGO_SETTINGS = ("MONGO_USER", "MONGO_PASS", "MONGO_HOST", "MONGO_PORT")  # Required settings
+
+# Load environment variables from .env. load_dotenv never overrides variables that are already set,
+# so parsing is skipped when all required settings are present (e.g. in spawned worker processes,
+# which inherit the parent's environment). Optional settings such as MONGO_MAX_POOL_SIZE must then
+# be set in the environment as well.
+if not all(name in os.environ for name in MONGO_SETTINGS):
+    load_dotenv()
 
 # MongoDB Settings
 MONGO_USER = os.getenv("MONGO_USER", "default_user")
@@ -31,108 +56,759 @@ MONGO_PASS = os.getenv("MONGO_PASS", "default_pass")
 MONGO_HOST = os.getenv("MONGO_HOST", "localhost")
 MONGO_PORT = os.getenv("MONGO_PORT", "27017")
 
+# Connection pool size. When set, it takes precedence over the pool sizing in `pool_options`.
+MONGO_MAX_POOL_SIZE = os.getenv("MONGO_MAX_POOL_SIZE")
+
 ESCAPED_USR = urllib.parse.quote_plus(MONGO_USER)
 ESCAPED_PWD = urllib.parse.quote_plus(MONGO_PASS)
 
 MONGO_URI = f"mongodb://{ESCAPED_USR}:{ESCAPED_PWD}@{MONGO_HOST}:{MONGO_PORT}/"
 
+# Wire compression: zstd and snappy are used only if their optional packages are installed,
+# zlib is always available as a fallback. The server uses the first listed one it supports.
+MONGO_COMPRESSORS = ",".join(
+    [name for name, module in (("zstd", "zstandard"), ("snappy", "snappy")) if importlib.util.find_spec(module)]
+    + ["zlib"]
+)
+
+BULK_BATCH_SIZE = 1000  # Maximum number of operations sent in a single bulk write
+MAX_RETRY_DELAY = 30    # Upper bound in seconds for the exponential retry backoff
+LOOKUP_WINDOW = 0.005   # Seconds `find_one_batched` waits to coalesce point lookups into one query
+
+# Options shared by the synchronous and asynchronous clients
+CLIENT_OPTIONS = {
+    # "serverSelectionTimeoutMS": 30000,  # Timeout when connecting to the server (30 seconds)
+    "connectTimeoutMS": 60000,
+    "socketTimeoutMS": 120000,  # Socket operation timeout time
+    "maxPoolSize": int(MONGO_MAX_POOL_SIZE or 50),  # Maximum connection pool size
+    "retryWrites": True,  # Allows automatic retry of writes
+    "compressors": MONGO_COMPRESSORS,  # Compresses the wire payload
+    "zlibCompressionLevel": 3  # Fast zlib level when zlib is negotiated
+}
+
 ##################################################################################################
 #                                        IMPLEMENTATION                                          #
 ##################################################################################################
 
+def pool_options(max_workers=None):
+    """
+    Builds client options with a connection pool sized for a given number of worker threads.
+
+    Without `max_workers`, the default options from `CLIENT_OPTIONS` are returned. Otherwise the
+    pool keeps `max_workers` warm connections and allows a few extra for the main-thread cursor,
+    so bulk writes do not wait on pool checkout and sockets are not over-provisioned. An explicit
+    `MONGO_MAX_POOL_SIZE` is kept as the upper bound.
+
+    Args:
+        max_workers (int, optional): Number of threads issuing operations concurrently.
+
+    Returns:
+        dict: Keyword arguments for `MongoClient`.
+    """
+
+    if max_workers is None:
+        return CLIENT_OPTIONS
+
+    max_pool_size = int(MONGO_MAX_POOL_SIZE) if MONGO_MAX_POOL_SIZE else max_workers + 4
+
+    return {
+        **CLIENT_OPTIONS,
+        "maxPoolSize": max_pool_size,  # Workers plus headroom for the cursor
+        "minPoolSize": min(max_workers, max_pool_size),  # Connections kept open for the workers
+        "waitQueueTimeoutMS": 10000  # Fail fast instead of waiting forever for a connection
+    }
+
 class MongoDBConnection:
     """
-    Context-managed MongoDB connection handler.
+    Lightweight handle on a MongoDB collection.
 
-    This class establishes a connection to a MongoDB instance using parameters loaded from
-    environment variables. It supports connection pooling, timeouts, and retry logic.
+    The underlying client is owned by the module-level cache in `get_client`, so handles are cheap
+    to construct: many of them can be created, or used in overlapping `with` blocks, without
+    reconnecting or closing the shared connection pool.
+
+    Args:
+        database_name (str): Name of the target MongoDB database.
+        collection_name (str): Name of the target MongoDB collection.
+        document_class (type, optional): Class used to decode returned documents. Pass
+            `bson.raw_bson.RawBSONDocument` to keep documents as undecoded BSON blobs when
+            they are only forwarded to another collection.
+        read_preference (ReadPreference, optional): Read preference for the collection, e.g.
+            `SecondaryPreferred(max_staleness=120)` to offload scans from the primary. Writes
+            always go to the primary.
+        read_concern (ReadConcern, optional): Read concern for the collection.
+        client (MongoClient, optional): Pre-built client to use. Defaults to the cached client
+            from `get_client` for `max_workers`, so connections with the same pool size share
+            one connection pool.
+        max_workers (int, optional): Number of threads sharing the connection, used to size the
+            connection pool (see `pool_options`). Ignored when `client` is given.
+
+    The context manager is kept for compatibility: exiting it only flushes updates queued by
+    `update_document`. Cached clients are closed once, when the process exits.
 
     Attributes:
         client (MongoClient): PyMongo client instance.
         database (Database): Reference to the target MongoDB database.
         collection (Collection): Reference to the target MongoDB collection.
+        warn_full_projection (bool): Whether `find_documents` warns when no projection is given.
     """
 
-    def __init__(self, database_name, collection_name):
+    def __init__(self, database_name, collection_name, document_class=dict, read_preference=None, read_concern=None,
+                 client=None, max_workers=None):
         self.uri = MONGO_URI
-        self.client = MongoClient(
-            self.uri,
-            # serverSelectionTimeoutMS=30000,  # Timeout when connecting to the server (30 seconds)
-            connectTimeoutMS=60000,
-            socketTimeoutMS=120000,  # Socket operation timeout time
-            maxPoolSize=50,  # Maximum connection pool size
-            retryWrites=True  # Allows automatic retry of writes
-        )
+        self.client = client if client is not None else get_client(max_workers)
 
         self.database = self.client[database_name]
-        self.collection = self.database[collection_name]
-        logger.info("MongoDB connection initialized.")
+        self.collection = self.database.get_collection(
+            collection_name,
+            codec_options=self.client.codec_options.with_options(document_class=document_class),
+            read_preference=read_preference,
+            read_concern=read_concern
+        )
+        self.warn_full_projection = True  # Warn when `find_documents` is called without a projection
+        self._pending = []  # Updates queued by `update_document`, applied by `flush_updates`
+        self._pending_lock = threading.Lock()
+        # Live handles are flushed by `close_clients` at exit; a handle garbage collected with queued
+        # updates only warns, since network I/O is not safe from a finalizer
+        _live_handles.add(self)
+        self._pending_finalizer = weakref.finalize(self, warn_unflushed_updates, self.collection.full_name, self._pending)
+        self._pending_finalizer.atexit = False
+        self._lookups = {}  # `_id` -> Future for lookups queued by `find_one_batched`
+        self._lookups_timer = None
+        self._lookups_lock = threading.Lock()
+        logger.debug("MongoDB connection handle created.")
 
     def __enter__(self):
-        logger.info("MongoDB connection opened.")
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.client.close()
-        logger.info("MongoDB connection closed.")
+        self._flush_lookups()
+        self.flush_updates()
 
-    def find_documents(self, filter_query, projection=None, limit_size=None):
+    def find_documents(self, filter_query, projection=None, limit_size=None, batch_size=1000, read_preference=None,
+                       raw=False, hint=None):
         """
-        Retrieves documents from the MongoDB collection based on a filter.
+        Streams documents from the MongoDB collection based on a filter.
+
+        Documents are yielded as the cursor fetches them, so memory stays bounded by the
+        cursor batch instead of the whole result set, and the caller's processing overlaps
+        with the network fetch of the next batch.
+
+        `batch_size` sets how many documents each server round trip returns. Larger batches
+        mean fewer round trips but more memory per batch (about `batch_size` x average
+        document size); without it the server returns 101 documents first and then up to
+        16 MiB per batch.
+
+        `hint` forces the index used by the query, for cases where the planner picks a worse one.
+        Paired with a projection limited to indexed fields (and excluding `_id` unless it is part
+        of the index), it makes a covered query: the server answers from the index alone,
+        without fetching any document. For example, with an index on `{status: 1, ts: 1}`:
+
+            conn.find_documents({"status": "pending"}, {"_id": 0, "status": 1, "ts": 1},
+                                hint=[("status", 1), ("ts", 1)])
 
         Args:
             filter_query (dict): MongoDB filter query to match documents.
-            projection (dict, optional): Dictionary specifying fields to include or exclude.
+            projection (dict | list[str], optional): Dictionary specifying fields to include or
+                exclude, or a list of field names to include.
             limit_size (int, optional): Limits the number of returned documents.
+            batch_size (int, optional): Documents per cursor batch. None defers to the server
+                defaults, which suit small queries answered by the first 101-document batch.
+            read_preference (ReadPreference, optional): Read preference for this query only,
+                overriding the connection's. `SecondaryPreferred(max_staleness=120)` moves large
+                scans off the primary, at the cost of reading data that may lag the primary by
+                the replication lag (bounded here by 120 seconds).
+            raw (bool): Return `RawBSONDocument`s instead of dicts. Fields are then decoded only
+                when accessed (`doc["field"]`), which saves most of the decoding cost when a
+                caller reads a few fields or forwards documents unchanged. Combine with a
+                projection to also cut the bytes sent over the wire.
+            hint (str | list[tuple[str, int]], optional): Index to use, by name (e.g. `"_id_"`) or
+                by key pattern.
 
-        Returns:
-            list[dict]: List of documents matching the filter.
+        Yields:
+            dict | RawBSONDocument: Documents matching the filter.
+
+        Raises:
+            PyMongoError: If the query fails after some documents were yielded. A query that
+                fails before returning any document is logged and yields nothing.
         """
 
+        # Wire bytes and BSON decoding grow with every returned field, so hot paths should project
+        if isinstance(projection, (list, tuple)):
+            projection = {field: 1 for field in projection}
+        elif projection is None and self.warn_full_projection:
+            logger.warning(f"find without projection on {self.collection.full_name}: full documents are returned.")
+
+        collection = self.collection
+        if read_preference is not None:
+            collection = collection.with_options(read_preference=read_preference)
+        if raw:
+            collection = collection.with_options(
+                codec_options=collection.codec_options.with_options(document_class=RawBSONDocument)
+            )
+
+        # Documents are counted as they are yielded; the total is logged once the stream ends
+        # (or is closed early by the caller), without an extra pass over the results
+        retrieved = 0
         try:
-            cursor = self.collection.find(filter_query, projection)
+            cursor = collection.find(filter_query, projection)
+            if hint is not None:
+                cursor = cursor.hint(hint)
+            if batch_size is not None:
+                cursor = cursor.batch_size(batch_size)
             # Applies the limit only if `limit` has an integer value
             if limit_size is not None:
                 cursor = cursor.limit(limit_size)
-            documents = list(cursor)
 
-            logger.info(f"Retrieved {len(documents)} documents for processing.")
-            return documents
-        except Exception as e:
+            try:
+                for document in cursor:
+                    retrieved += 1
+                    yield document
+            finally:
+                logger.info(f"Retrieved {retrieved} documents for processing.")
+        except ServerSelectionTimeoutError as e:
+            logger.error(f"MongoDB server connection failed: {e}")
+            if retrieved:
+                raise
+        except PyMongoError as e:
             logger.error(f"Error fetching documents from MongoDB: {e}")
-            if "server selection timeout" in str(e).lower():
-                logger.error("MongoDB server connection failed. Retrying...")
-            return []
+            if retrieved:
+                # Ending quietly would hand the caller a truncated result that looks complete
+                raise
+
+    def find_documents_batched(self, filter_query, projection=None, batch_size=1000, limit_size=None,
+                               read_preference=None, raw=False, hint=None):
+        """
+        Streams documents from the MongoDB collection in lists of up to `batch_size` documents.
+
+        Args:
+            filter_query (dict): MongoDB filter query to match documents.
+            projection (dict | list[str], optional): Dictionary specifying fields to include or
+                exclude, or a list of field names to include.
+            batch_size (int): Maximum number of documents per yielded list.
+            limit_size (int, optional): Limits the number of returned documents.
+            read_preference (ReadPreference, optional): Read preference for this query only.
+            raw (bool): Return `RawBSONDocument`s instead of dicts (see `find_documents`).
+            hint (str | list[tuple[str, int]], optional): Index to use (see `find_documents`).
+
+        Yields:
+            list[dict]: A batch of documents matching the filter.
+
+        Raises:
+            PyMongoError: If the query fails after some documents were yielded.
+        """
+
+        documents = self.find_documents(filter_query, projection, limit_size, batch_size=batch_size,
+                                        read_preference=read_preference, raw=raw, hint=hint)
+        while True:
+            batch = list(islice(documents, batch_size))
+            if not batch:
+                break
+            yield batch
+
+    def find_one_batched(self, _id):
+        """
+        Looks up a document by `_id`, coalescing concurrent lookups into a single query.
+
+        The first lookup starts a `LOOKUP_WINDOW` timer; every lookup made before it fires is
+        fetched with the same `find({"_id": {"$in": [...]}})`, so N point lookups cost one round
+        trip instead of N, at the price of up to `LOOKUP_WINDOW` seconds of extra latency. The
+        query is sent right away once `BULK_BATCH_SIZE` ids are queued.
+
+        Example:
+            futures = [conn.find_one_batched(_id) for _id in ids]
+            documents = [future.result() for future in futures]
+
+        Args:
+            _id: Hashable `_id` of the document to fetch.
+
+        Returns:
+            Future: Resolves to the document, or to None if no document has this `_id`. If the
+            query fails, the exception is raised by `Future.result()`. The future can be
+            cancelled until the query is sent.
+        """
+
+        with self._lookups_lock:
+            future = self._lookups.get(_id)
+            if future is None:
+                future = self._lookups[_id] = Future()
+            if len(self._lookups) < BULK_BATCH_SIZE:
+                if self._lookups_timer is None:
+                    self._lookups_timer = threading.Timer(LOOKUP_WINDOW, self._flush_lookups)
+                    self._lookups_timer.start()
+                return future
+            lookups = self._take_lookups()
+
+        self._run_lookups(lookups)
+        return future
 
-    def update_document(self, filter_query, update_values, retries=3, delay=5):
+    def _take_lookups(self):
         """
-        Updates a single document in the MongoDB collection with retry logic.
+        Detaches the queued lookups and cancels their timer. Must be called holding `_lookups_lock`.
+
+        Returns:
+            dict: Queued `_id` -> Future mapping.
+        """
+
+        lookups, self._lookups = self._lookups, {}
+        if self._lookups_timer is not None:
+            self._lookups_timer.cancel()
+            self._lookups_timer = None
+        return lookups
+
+    def _flush_lookups(self):
+        """
+        Runs the lookups queued by `find_one_batched` (called when the timer fires).
+        """
+
+        with self._lookups_lock:
+            lookups = self._take_lookups()
+
+        if lookups:
+            self._run_lookups(lookups)
+
+    def _run_lookups(self, lookups):
+        """
+        Fetches the queued ids with a single `$in` query and resolves their futures.
+
+        Args:
+            lookups (dict): `_id` -> Future mapping to resolve.
+        """
+
+        # Futures cancelled by their caller are dropped; the others can no longer be cancelled
+        lookups = {_id: future for _id, future in lookups.items() if future.set_running_or_notify_cancel()}
+        if not lookups:
+            return
+
+        try:
+            found = {doc["_id"]: doc for doc in self.collection.find({"_id": {"$in": list(lookups)}})}
+        except Exception as e:
+            logger.error(f"Error retrieving documents from MongoDB: {e}")
+            for future in lookups.values():
+                future.set_exception(e)
+            return
+
+        for _id, future in lookups.items():
+            future.set_result(found.get(_id))
+
+    def find_and_update(self, filter_query, update_values):
+        """
+        Updates every document matching a filter with a single server-side `update_many`.
+
+        Prefer this over fetching documents with `find_documents` and updating them one by one
+        when the new values do not depend on each document: no documents cross the network and
+        the whole update costs one round trip. When the documents are needed anyway, fetch only
+        their `_id` (`projection={"_id": 1}`) and update them with `bulk_update`.
+
+        Args:
+            filter_query (dict): MongoDB filter query to match documents.
+            update_values (dict): Dictionary of fields to update (`$set`).
+
+        Returns:
+            UpdateResult | None: The result of the update operation, or None if it fails.
+        """
+
+        try:
+            result = self.collection.update_many(filter_query, {'$set': update_values})
+            logger.info(f"Updated {result.modified_count} of {result.matched_count} matching documents.")
+            return result
+        except Exception as e:
+            logger.error(f"Error updating documents in MongoDB: {e}")
+            return None
+
+    def update_document(self, filter_query, update_values, retries=3, delay=0.1):
+        """
+        Queues a `$set` update of a single document.
+
+        Queued updates are applied together through `bulk_update`, so a caller looping over many
+        documents pays one round trip per `BULK_BATCH_SIZE` updates instead of one per document.
+        The queue is flushed when it reaches `BULK_BATCH_SIZE`, when `flush_updates` is called
+        and when the context manager exits.
+
+        Until then the updates only exist in memory. Handles used outside `with` must call
+        `flush_updates` once done: updates still queued when a handle is garbage collected are
+        discarded with a warning. Handles still alive at interpreter exit are flushed by
+        `close_clients`, but queued updates are lost if the process is killed.
 
         Args:
             filter_query (dict): Query to match the document to update.
             update_values (dict): Dictionary of fields to update (`$set`).
+            retries (int): Number of retry attempts on failure, per bulk write.
+            delay (float): Base delay in seconds for the exponential backoff between retries.
+
+        Returns:
+            list[BulkWriteResult | None] | None: The results of the bulk writes if this call
+            triggered a flush, otherwise None.
+        """
+
+        with self._pending_lock:
+            self._pending.append((filter_query, update_values))
+            if len(self._pending) < BULK_BATCH_SIZE:
+                return None
+            pending = self._pending[:]  # The list is cleared in place: the finalizer keeps a reference
+            self._pending.clear()
+
+        return self.bulk_update(pending, retries=retries, delay=delay)
+
+    def flush_updates(self, retries=3, delay=0.1):
+        """
+        Applies all updates queued by `update_document`.
+
+        Args:
+            retries (int): Number of retry attempts on failure, per bulk write.
+            delay (float): Base delay in seconds for the exponential backoff between retries.
+
+        Returns:
+            list[BulkWriteResult | None]: The results of the bulk writes (empty if nothing was queued).
+        """
+
+        with self._pending_lock:
+            pending = self._pending[:]  # The list is cleared in place: the finalizer keeps a reference
+            self._pending.clear()
+
+        return self.bulk_update(pending, retries=retries, delay=delay) if pending else []
+
+    def bulk_update(self, updates, batch_size=BULK_BATCH_SIZE, retries=3, delay=0.1):
+        """
+        Applies many `$set` updates with bulk writes, in chunks of `batch_size`.
+
+        Updates that filter on a single `_id` and set the same values are grouped into one
+        `UpdateMany({"_id": {"$in": [...]}})`, so the server runs one update per distinct payload
+        instead of one per document. Other updates are sent as individual `UpdateOne` operations.
+        Each distinct `$set` document is encoded to BSON once and reused by every operation that
+        applies it.
+
+        Bulk writes are unordered, so the server may apply their operations in any order, unless
+        the order matters: when a document is updated more than once, or a filter other than
+        `_id` is used, the pending groups are emitted first and the bulk writes are ordered, so
+        the last update of a document wins. An ordered bulk write stops at its first write error.
+
+        Each chunk is retried as a whole on failure. Per-document write errors reported by the
+        server (e.g. validation failures) are not retried, since they would fail again.
+
+        Args:
+            updates (list[tuple[dict, dict]]): `(filter_query, update_values)` pairs.
+            batch_size (int): Maximum number of operations per bulk write.
+            retries (int): Number of retry attempts on failure, per chunk.
+            delay (float): Base delay in seconds for the exponential backoff between retries.
+
+        Returns:
+            list[BulkWriteResult | None]: One result per chunk, or None for chunks that failed.
+        """
+
+        operations = []
+        grouped_ids = defaultdict(list)     # Payload key -> _id values sharing that payload
+        encoded_updates = {}                # Payload key -> pre-encoded {"$set": values}
+        seen_ids = set()                    # _id values updated since the groups were last emitted
+        ordered = False                     # Whether operations must be applied in sequence
+
+        def emit_groups():
+            for key, ids in grouped_ids.items():
+                for i in range(0, len(ids), batch_size):  # Keeps each $in list bounded
+                    chunk = ids[i:i + batch_size]
+                    if len(chunk) == 1:
+                        operations.append(UpdateOne({"_id": chunk[0]}, encoded_updates[key]))
+                    else:
+                        operations.append(UpdateMany({"_id": {"$in": chunk}}, encoded_updates[key]))
+            grouped_ids.clear()
+            seen_ids.clear()
+
+        for filter_query, update_values in updates:
+            # The value type is part of the key so that e.g. True and 1 are not grouped together
+            key = tuple((field, type(value), value) for field, value in update_values.items())
+            try:
+                update = encoded_updates.get(key)
+                if update is None:
+                    # Encoded once per distinct payload and sent as is by every operation using it
+                    update = encoded_updates[key] = RawBSONDocument(
+                        bson.encode({'$set': update_values}, codec_options=self.collection.codec_options)
+                    )
+            except (TypeError, ValueError, BSONError):
+                # Unhashable values (arrays, embedded documents) are updated individually; values
+                # that cannot be encoded are left to the bulk write, which reports the error
+                key, update = None, {'$set': update_values}
+
+            _id = filter_query.get("_id") if len(filter_query) == 1 else None
+            if _id is None or isinstance(_id, dict):  # Not a plain {"_id": value} filter
+                # It may match grouped documents, so the groups are sent first to keep the order
+                emit_groups()
+                ordered = True
+                operations.append(UpdateOne(filter_query, update))
+                continue
+            if _id in seen_ids:
+                # A later update of the same document must be applied after the earlier one
+                emit_groups()
+                ordered = True
+            seen_ids.add(_id)
+
+            if key is None:
+                operations.append(UpdateOne(filter_query, update))
+            else:
+                grouped_ids[key].append(_id)
+
+        emit_groups()
+
+        return [
+            self._bulk_write_with_retry(operations[i:i + batch_size], retries, delay, ordered)
+            for i in range(0, len(operations), batch_size)
+        ]
+
+    def _bulk_write_with_retry(self, operations, retries, delay, ordered=False):
+        """
+        Executes one bulk write with retry logic.
+
+        Only connection errors (e.g. during a replica set failover) are retried, with exponential
+        backoff and full jitter: attempt `n` waits a random time between 0 and
+        `min(MAX_RETRY_DELAY, delay * 2**n)` seconds. Other errors fail fast.
+
+        Args:
+            operations (list): Bulk write operations to execute.
             retries (int): Number of retry attempts on failure.
-            delay (int): Seconds to wait between retry attempts.
+            delay (float): Base delay in seconds for the exponential backoff between retries.
+            ordered (bool): Apply the operations in sequence, stopping at the first write error.
 
         Returns:
-            UpdateResult | None: The result of the update operation, or None if all retries fail.
+            BulkWriteResult | None: The result of the bulk write, or None if it failed.
         """
 
         for attempt in range(retries):
             try:
-                # Performs update using `$set` to create or update the field
-                result = self.collection.update_one(filter_query, {'$set': update_values})
-                if result.matched_count:
-                    logger.info("Document updated successfully.")
-                    return result
-                else:
-                    logger.warning("No document found to update.")
+                result = self.collection.bulk_write(operations, ordered=ordered)
+                logger.info(f"Bulk update of {len(operations)} operations matched {result.matched_count} documents.")
                 return result
+            except BulkWriteError as e:
+                # Operations before (ordered) or besides (unordered) the failing ones were applied;
+                # failing ones would fail again
+                logger.error(f"Bulk update completed with {len(e.details.get('writeErrors', []))} write errors.")
+                return None
+            except ConnectionFailure as e:  # Includes AutoReconnect and NetworkTimeout
+                logger.error(f"Error updating documents in MongoDB: {e}")
+                if attempt < retries - 1:  # Do not sleep at the last attempt
+                    backoff = random.uniform(0, min(MAX_RETRY_DELAY, delay * 2 ** attempt))
+                    logger.info(f"Retrying in {backoff:.2f} seconds...")
+                    time.sleep(backoff)  # Jittered wait so concurrent callers do not retry in lockstep
+                else:
+                    logger.error("Final retry failed. Skipping this batch.")
+                    return None # If after 'retries' attempts it still fails, ignore it
             except Exception as e:
+                # Deterministic errors (e.g. invalid updates) would fail again, so they are not retried
+                logger.error(f"Error updating documents in MongoDB: {e}")
+                return None
+
+_live_handles = weakref.WeakSet()  # MongoDBConnection handles flushed by `close_clients` at exit
+_clients = []                       # Clients created by `get_client`, closed by `close_clients`
+
+def warn_unflushed_updates(collection_name, pending):
+    """
+    Warns about updates discarded with a `MongoDBConnection` that was never flushed.
+
+    Called by the handle's finalizer when it is garbage collected. The updates are not applied:
+    running retried network I/O from a finalizer is unsafe.
+
+    Args:
+        collection_name (str): Full name of the dropped handle's collection.
+        pending (list[tuple[dict, dict]]): `(filter_query, update_values)` pairs still queued.
+    """
+
+    if pending:
+        logger.warning(f"Discarded {len(pending)} queued updates on {collection_name}: "
+                       f"call flush_updates() before dropping the connection.")
+
+def close_clients():
+    """
+    Flushes the updates queued on live handles, then closes the clients from `get_client`.
+
+    Registered once with `atexit`, so queued updates are always written before any client
+    they depend on is closed.
+    """
+
+    for handle in list(_live_handles):
+        try:
+            handle.flush_updates()
+        except Exception as e:
+            logger.error(f"Error flushing queued updates at exit: {e}")
+
+    for client in _clients:
+        client.close()
+
+atexit.register(close_clients)
+
+@lru_cache(maxsize=None)
+def get_client(max_workers=None):
+    """
+    Returns the cached MongoDB client for a pool size.
+
+    All scripts connect through the same `MONGO_URI`, so one client (one connection pool and one
+    set of monitor threads) can serve every collection. A pool cannot be resized, so there is one
+    client per distinct `max_workers` value: code in a process should use a single value to share
+    one client. Clients stay open for the life of the process and are closed at exit.
+
+    Args:
+        max_workers (int, optional): Number of threads sharing the client, used to size the
+            connection pool (see `pool_options`).
+
+    Returns:
+        MongoClient: Shared PyMongo client instance for this pool size.
+    """
+
+    client = MongoClient(MONGO_URI, **pool_options(max_workers))
+    _clients.append(client)  # Closed at exit by `close_clients`
+    return client
+
+@lru_cache(maxsize=32)
+def get_collection(database_name, collection_name, max_workers=None):
+    """
+    Returns a cached collection handle for the given database and collection.
+
+    The first call for a `(database_name, collection_name, max_workers)` key opens a
+    `MongoDBConnection` on the client from `get_client` for that pool size; later calls with
+    the same key in the same process reuse the same collection handle.
+
+    Args:
+        database_name (str): Name of the target MongoDB database.
+        collection_name (str): Name of the target MongoDB collection.
+        max_workers (int, optional): Number of threads using the collection (see `get_client`).
+
+    Returns:
+        Collection: Reference to the target MongoDB collection.
+    """
+
+    return MongoDBConnection(database_name, collection_name, max_workers=max_workers).collection
+
+def ensure_index(collection, field_name, sparse=False):
+    """
+    Creates an ascending index on a field unless an existing index already starts with it.
+
+    Intended to run before a script scans a collection by `field_name`, so the query uses an
+    index probe instead of a collection scan. Existing indexes are left untouched, which also
+    avoids option conflicts with an index created elsewhere on the same key.
+
+    Args:
+        collection (Collection): The MongoDB collection to index.
+        field_name (str): Field to index.
+        sparse (bool, optional): Only index documents that contain the field. Suited to
+            `{"$exists": True}` queries.
+
+    The index only speeds the scan up, so missing privileges (e.g. a read-only user without
+    `listIndexes`/`createIndex`) are logged as a warning and the script continues unindexed.
+    Building an index on a large collection blocks until the build finishes.
+
+    Returns:
+        str | None: Name of the created index, or None if a usable index already existed or
+        it could not be created.
+    """
+
+    try:
+        for index in collection.index_information().values():
+            if index["key"][0][0] == field_name:
+                return None
+
+        index_name = collection.create_index(field_name, sparse=sparse)
+    except OperationFailure as e:
+        logger.warning(f"Could not ensure an index on '{field_name}' in {collection.full_name}: {e}")
+        return None
+    logger.info(f"Created index '{index_name}' on {collection.full_name}.")
+    return index_name
+
+class AsyncMongoDBConnection:
+    """
+    Async context-managed MongoDB connection handler.
+
+    Asyncio counterpart of `MongoDBConnection`, built on PyMongo's native asynchronous client.
+    Concurrent operations are awaited on a single event loop instead of being spread across
+    worker threads. Use it with `async with`; independent updates can be submitted together
+    with `asyncio.gather`, so client-side work and database round trips overlap:
+
+        async with AsyncMongoDBConnection("db", "coll") as conn:
+            documents = await conn.find_documents({"status": "new"}, projection=["_id"])
+            await asyncio.gather(*(conn.update_document({"_id": d["_id"]}, {"status": "done"})
+                                   for d in documents))
+
+    Args:
+        database_name (str): Name of the target MongoDB database.
+        collection_name (str): Name of the target MongoDB collection.
+
+    Attributes:
+        client (AsyncMongoClient): PyMongo asynchronous client instance.
+        database (AsyncDatabase): Reference to the target MongoDB database.
+        collection (AsyncCollection): Reference to the target MongoDB collection.
+    """
+
+    def __init__(self, database_name, collection_name):
+        self.uri = MONGO_URI
+        self.client = AsyncMongoClient(self.uri, **CLIENT_OPTIONS)
+
+        self.database = self.client[database_name]
+        self.collection = self.database[collection_name]
+        logger.info("MongoDB async connection initialized.")
+
+    async def __aenter__(self):
+        logger.info("MongoDB async connection opened.")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.client.close()
+        logger.info("MongoDB async connection closed.")
+
+    async def find_documents(self, filter_query, projection=None, limit_size=None, batch_size=1000):
+        """
+        Retrieves documents from the MongoDB collection based on a filter.
+
+        Args:
+            filter_query (dict): MongoDB filter query.
+            projection (dict | list[str], optional): Fields to return, as a projection document
+                or a list of field names.
+            limit_size (int, optional): Maximum number of documents to return.
+            batch_size (int): Number of documents returned per server round trip.
+
+        Returns:
+            list: The matching documents (empty if the query fails).
+        """
+
+        if isinstance(projection, (list, tuple)):
+            projection = {field: 1 for field in projection}
+
+        try:
+            cursor = self.collection.find(filter_query, projection).batch_size(batch_size)
+            if limit_size is not None:
+                cursor = cursor.limit(limit_size)
+            # A limit of 0 means no limit (as for `limit`), but `to_list` rejects a length of 0
+            documents = await cursor.to_list(length=limit_size or None)
+            logger.info(f"Retrieved {len(documents)} documents for processing.")
+            return documents
+        except ServerSelectionTimeoutError as e:
+            logger.error(f"MongoDB server connection failed: {e}")
+            return []
+        except PyMongoError as e:
+            logger.error(f"Error retrieving documents from MongoDB: {e}")
+            return []
+
+    async def update_document(self, filter_query, update_values, retries=3, delay=0.1):
+        """
+        Updates a single document with a `$set`, retrying on connection errors.
+
+        Retries use the same exponential backoff with full jitter as `MongoDBConnection`, but
+        wait with `asyncio.sleep` so other operations keep running on the event loop.
+
+        Args:
+            filter_query (dict): Query to match the document to update.
+            update_values (dict): Dictionary of fields to update (`$set`).
+            retries (int): Number of retry attempts on failure.
+            delay (float): Base delay in seconds for the exponential backoff between retries.
+
+        Returns:
+            UpdateResult | None: The result of the update operation, or None if it failed.
+        """
+
+        for attempt in range(retries):
+            try:
+                return await self.collection.update_one(filter_query, {'$set': update_values})
+            except ConnectionFailure as e:  # Includes AutoReconnect and NetworkTimeout
                 logger.error(f"Error updating document in MongoDB: {e}")
                 if attempt < retries - 1:  # Do not sleep at the last attempt
-                    logger.info(f"Retrying in {delay} seconds...")
-                    time.sleep(delay)  # Wait 'delay' seconds before retrying
+                    await asyncio.sleep(random.uniform(0, min(MAX_RETRY_DELAY, delay * 2 ** attempt)))
                 else:
-                    logger.error("Final retry failed. Skipping this document.")
-                    return None # If after 'retries' attempts it still fails, ignore it
\ No newline at end of file
+                    logger.error("Final retry failed. Skipping this update.")
+            except Exception as e:
+                logger.error(f"Error updating document in MongoDB: {e}")
+                return None
+        return None
@@ -4,7 +4,7 @@
 # This module provides a preconfigured logger with color-coded output based on log severity.     #
 # It is intended to be used across all project scripts to maintain consistent, readable logs.    #
 # Uses the 'colorlog' library to apply different colors to DEBUG, INFO, WARNING, ERROR, and      #
-# CRITICAL messages.                                                                             #
+# CRITICAL messages. Records are handed off through a queue so logging never blocks the caller.  #
 ##################################################################################################
 
 ##################################################################################################
@@ -12,6 +12,9 @@
 ##################################################################################################
 
 import logging                              # Logs and events
+import logging.handlers                     # Non-blocking queue handler
+import queue                                # Log record queue
+import atexit                               # Flush logs on exit
 import colorlog                             # Logs and events
 
 ##################################################################################################
@@ -28,7 +31,14 @@ log_colors = {'DEBUG': 'cyan', 'INFO': 'green', 'WARNING': 'yellow', 'ERROR': 'r
 handler = colorlog.StreamHandler()
 handler.setFormatter(colorlog.ColoredFormatter("%(log_color)s%(levelname)s - %(message)s", log_colors=log_colors))
 
-# Set up logger with the color handler
+# Records are queued by the calling thread and written by a background listener thread, so worker
+# threads never block on the handler's lock or on terminal I/O
+log_queue = queue.SimpleQueue()
+listener = logging.handlers.QueueListener(log_queue, handler)
+listener.start()
+atexit.register(listener.stop)  # Flush pending records on exit
+
+# Set up logger with the queued color handler
 logger = logging.getLogger(__name__)
-logger.addHandler(handler)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
 logger.setLevel(logging.DEBUG)
\ No newline at end of file